@@ -1,50 +1,231 @@
 import streamlit as st
-from decimal import Decimal, InvalidOperation
-import re
+import bisect
 from datetime import datetime, timedelta
-import json
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 import os
+import re
+import tempfile
 
 # File to store settings
 SETTINGS_FILE = "app_settings.json"
-
+# Append-only log with one JSON expense per line
+EXPENSES_FILE = "expenses.log"
+# Stylesheet injected into every page, shipped next to this script
+STYLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "style.css")
+# Row count above which history aggregation switches to NumPy
+VECTORIZE_THRESHOLD = 1000
+# Strips everything but digits and the decimal point from amount inputs
+_CLEAN_NUM = re.compile(r'[^\d.]')
+
+@st.cache_data
 def load_settings():
-    """Load settings from file"""
+    """Load settings from file (cached across sessions until the next save)"""
+    import orjson
+
     if os.path.exists(SETTINGS_FILE):
         try:
-            with open(SETTINGS_FILE, 'r') as f:
-                settings = json.load(f)
+            with open(SETTINGS_FILE, 'rb') as f:
+                settings = orjson.loads(f.read())
                 return settings
         except Exception:
             return get_default_settings()
     return get_default_settings()
 
-def save_settings():
-    """Save current settings to file"""
-    settings = {
+def serialize_settings():
+    """Serialize the current settings as they are written to file"""
+    import orjson
+
+    return orjson.dumps({
         'currency': st.session_state.currency,
         'theme': st.session_state.theme,
         'notifications_enabled': st.session_state.notifications_enabled,
-        'critical_warning_enabled': st.session_state.critical_warning_enabled,
-        'expense_history': [
-            {**expense, 'date': expense['date'].isoformat()} 
-            for expense in st.session_state.expense_history
-        ]
-    }
+        'critical_warning_enabled': st.session_state.critical_warning_enabled
+    })
+
+def save_settings():
+    """Save current settings to file unless they match what was last persisted"""
+    data = serialize_settings()
+    data_hash = hash(data)
+    if data_hash == st.session_state.get('_last_settings_hash'):
+        return
+    tmp_file = None
     try:
-        with open(SETTINGS_FILE, 'w') as f:
-            json.dump(settings, f)
+        # Sessions run as threads in one process, so each save needs its own temp file
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(os.path.abspath(SETTINGS_FILE)),
+            prefix=os.path.basename(SETTINGS_FILE) + '.',
+            suffix='.tmp',
+            delete=False
+        ) as f:
+            tmp_file = f.name
+            f.write(data)
+        os.replace(tmp_file, SETTINGS_FILE)
+        load_settings.clear()
+        st.session_state._last_settings_hash = data_hash
     except Exception as e:
+        if tmp_file and os.path.exists(tmp_file):
+            os.remove(tmp_file)
         st.error(f"Failed to save settings: {str(e)}")
 
+def to_cents(amount):
+    """Round a Decimal amount half up to integer cents (None if it is too large)"""
+    try:
+        return int(amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP) * 100)
+    except InvalidOperation:
+        return None
+
+@st.cache_data
+def load_expenses():
+    """Load expense history from the expense log (cached across sessions until the next append)"""
+    import orjson
+
+    expenses = []
+    if not os.path.exists(EXPENSES_FILE):
+        return expenses
+    try:
+        with open(EXPENSES_FILE, 'rb') as f:
+            for line in f:
+                # Skip blank, partially written or malformed records, keeping the rest
+                try:
+                    record = orjson.loads(line)
+                    amount = record['amount']
+                    if isinstance(amount, str):
+                        # Older log lines stored amounts as decimal strings
+                        amount = to_cents(Decimal(amount))
+                    if not isinstance(amount, int):
+                        continue
+                    expenses.append({
+                        'date': datetime.fromisoformat(record['date']),
+                        'amount': amount,
+                        'description': record['description'],
+                        'category': record['category'],
+                        'currency': record['currency'],
+                        'budget_type': record['budget_type'],
+                        'budget_period': record['budget_period']
+                    })
+                except (KeyError, TypeError, ValueError, InvalidOperation):
+                    continue
+    except OSError:
+        pass
+    return expenses
+
+def append_expense(expense):
+    """Append a single expense to the expense log"""
+    import orjson
+
+    try:
+        with open(EXPENSES_FILE, 'a+b') as f:
+            prefix = b''
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    # Terminate a partially written last line so this record stays parseable
+                    prefix = b'\n'
+            # orjson writes datetimes as ISO strings natively
+            f.write(prefix + orjson.dumps(expense) + b'\n')
+        load_expenses.clear()
+    except Exception as e:
+        st.error(f"Failed to save expense: {str(e)}")
+
+class HistoryStore:
+    """Expense history kept as parallel columns, one list per expense field"""
+
+    def __init__(self, expenses=()):
+        self.dates = []
+        self.amounts = []
+        self.descriptions = []
+        self.categories = []
+        # Integer ids (index into EXPENSE_CATEGORIES, -1 if unknown) for vectorized filtering
+        self.category_ids = []
+        self.currencies = []
+        self.budget_types = []
+        self.budget_periods = []
+        # NumPy buffers per column name, with the number of leading rows already converted
+        self._np_columns = {}
+        for expense in expenses:
+            self.append(expense)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def append(self, expense):
+        """Add an expense dict as a new row, keeping rows in date order"""
+        date = expense['date']
+        i = len(self.dates)
+        if i and date < self.dates[-1]:
+            # The wall clock went backwards (e.g. a DST change); insert in date order
+            i = bisect.bisect_right(self.dates, date)
+            # Rows from i on shift, so their NumPy copies must be converted again
+            for name, (buffer, synced) in self._np_columns.items():
+                self._np_columns[name] = (buffer, min(synced, i))
+        self.dates.insert(i, date)
+        self.amounts.insert(i, expense['amount'])
+        self.descriptions.insert(i, expense['description'])
+        self.categories.insert(i, expense['category'])
+        self.category_ids.insert(i, CATEGORY_IDS.get(expense['category'], -1))
+        self.currencies.insert(i, expense['currency'])
+        self.budget_types.insert(i, expense['budget_type'])
+        self.budget_periods.insert(i, expense['budget_period'])
+
+    def _column(self, name):
+        """Return an int64 NumPy copy of a column, converting only rows added since the last call"""
+        import numpy as np
+
+        values = getattr(self, name)
+        n = len(values)
+        buffer, synced = self._np_columns.get(name, (None, 0))
+        if buffer is None or len(buffer) < n:
+            # Grow geometrically so a single append does not copy the whole column
+            grown = np.empty(max(n, 2 * (0 if buffer is None else len(buffer)), 1024), dtype=np.int64)
+            if buffer is not None:
+                grown[:synced] = buffer[:synced]
+            buffer = grown
+        if synced < n:
+            buffer[synced:n] = values[synced:n]
+        self._np_columns[name] = (buffer, n)
+        return buffer[:n]
+
+    def select(self, start, category=None):
+        """Return indices of rows from start on matching category, and their total amount"""
+        end = len(self)
+        if end - start < VECTORIZE_THRESHOLD:
+            if category is None:
+                indices = range(start, end)
+            else:
+                categories = self.categories
+                indices = [i for i in range(start, end) if categories[i] == category]
+            amounts = self.amounts
+            return indices, sum(amounts[i] for i in indices)
+
+        import numpy as np
+
+        amounts = self._column('amounts')
+        if category is None:
+            return range(start, end), int(amounts[start:].sum())
+        category_id = CATEGORY_IDS.get(category)
+        if category_id is None:
+            return [], 0
+        mask = self._column('category_ids')[start:] == category_id
+        indices = np.flatnonzero(mask) + start
+        return indices.tolist(), int(amounts[start:][mask].sum())
+
+@st.cache_data
+def load_css():
+    """Read the app stylesheet once per process"""
+    with open(STYLE_FILE) as f:
+        return f.read()
+
+def mark_settings_dirty():
+    """Flag settings for saving at the end of the current run"""
+    st.session_state._settings_dirty = True
+
 def get_default_settings():
     """Return default settings"""
     return {
         'currency': 'USD',
         'theme': 'light',
         'notifications_enabled': True,
-        'critical_warning_enabled': True,
-        'expense_history': []
+        'critical_warning_enabled': True
     }
 
 # Page configuration
@@ -54,24 +235,6 @@ st.set_page_config(
     layout="centered"
 )
 
-# Initialize session state from stored settings
-if 'initialized' not in st.session_state:
-    settings = load_settings()
-    st.session_state.page = 'main_menu'
-    st.session_state.currency = settings['currency']
-    st.session_state.theme = settings['theme']
-    st.session_state.notifications_enabled = settings['notifications_enabled']
-    st.session_state.critical_warning_enabled = settings['critical_warning_enabled']
-    st.session_state.budget_type = None
-    st.session_state.budget_amount = None
-    st.session_state.budget_start_date = None
-    st.session_state.expenses = []
-    st.session_state.expense_history = [
-        {**expense, 'date': datetime.fromisoformat(expense['date'])}
-        for expense in settings['expense_history']
-    ]
-    st.session_state.initialized = True
-
 # Currency configuration
 CURRENCIES = {
     'USD': {'symbol': '$', 'name': 'US Dollar'},
@@ -80,6 +243,8 @@ CURRENCIES = {
     'GBP': {'symbol': '£', 'name': 'British Pound'},
     'CNY': {'symbol': '¥', 'name': 'Chinese Yuan'},
 }
+CURRENCY_KEYS = tuple(CURRENCIES.keys())
+CURRENCY_INDEX = {key: i for i, key in enumerate(CURRENCY_KEYS)}
 
 EXPENSE_CATEGORIES = [
     'Food',
@@ -92,67 +257,59 @@ EXPENSE_CATEGORIES = [
     'Shopping',
     'Other'
 ]
+HISTORY_CATEGORY_OPTIONS = ("All", *EXPENSE_CATEGORIES)
+CATEGORY_IDS = {category: i for i, category in enumerate(EXPENSE_CATEGORIES)}
+# Days covered by each history time period ("All time" has no cutoff)
+HISTORY_PERIOD_DAYS = {
+    "Last 7 days": 7,
+    "Last 30 days": 30,
+    "Last 3 months": 90,
+}
+HISTORY_PERIOD_OPTIONS = (*HISTORY_PERIOD_DAYS, "All time")
 
-# Custom CSS
-st.markdown("""
-    <style>
-    .stButton>button {
-        width: 100%;
-    }
-    .menu-button {
-        margin: 10px 0;
-    }
-    .currency-selector {
-        margin-bottom: 20px;
-    }
-    .budget-status {
-        padding: 1.5rem;
-        margin: 1rem 0;
-        border-radius: 1rem;
-        text-align: center;
-    }
-    .budget-ok { background-color: #d4edda; color: #155724; }
-    .budget-warning { background-color: #fff3cd; color: #856404; }
-    .budget-exceeded { background-color: #f8d7da; color: #721c24; }
-    .critical-warning { background-color: #dc3545; color: white; }
-    .remaining-budget {
-        font-size: clamp(1.5rem, 5vw, 2.5rem);
-        font-weight: bold;
-        margin: 1rem 0;
-    }
-    .notification {
-        padding: 1rem;
-        margin: 1rem 0;
-        border-radius: 0.5rem;
-        font-weight: bold;
-    }
-    /* Mobile responsive adjustments */
-    @media (max-width: 768px) {
-        .budget-status {
-            padding: 1rem;
-        }
-        .notification {
-            padding: 0.75rem;
-        }
-        .stButton>button {
-            padding: 0.5rem;
-            font-size: 0.9rem;
-        }
-    }
-    </style>
-""", unsafe_allow_html=True)
+# Initialize session state from stored settings
+if 'initialized' not in st.session_state:
+    settings = load_settings()
+    # Move history kept in older settings files over to the expense log
+    if settings.get('expense_history') and not os.path.exists(EXPENSES_FILE):
+        for expense in settings['expense_history']:
+            append_expense(expense)
+    st.session_state.page = 'main_menu'
+    st.session_state.currency = settings['currency']
+    st.session_state.theme = settings['theme']
+    st.session_state.notifications_enabled = settings['notifications_enabled']
+    st.session_state.critical_warning_enabled = settings['critical_warning_enabled']
+    st.session_state.budget_type = None
+    st.session_state.budget_amount = None
+    st.session_state.warn_threshold = None
+    st.session_state.critical_threshold = None
+    st.session_state.budget_start_date = None
+    st.session_state.total_expenses = 0
+    st.session_state.expense_history = HistoryStore(load_expenses())
+    # History rows from this index on belong to the current budget period
+    st.session_state.period_start_idx = len(st.session_state.expense_history)
+    st.session_state._last_settings_hash = hash(serialize_settings())
+    st.session_state.initialized = True
+
+# Custom CSS (re-emitted every run: Streamlit drops elements a rerun does not send)
+try:
+    st.markdown(f"<style>{load_css()}</style>", unsafe_allow_html=True)
+except OSError:
+    # Render without custom styling rather than failing the whole page
+    pass
 
 def format_amount(amount, currency='USD'):
-    """Format amount with currency symbol"""
+    """Format an amount in cents with currency symbol"""
     symbol = CURRENCIES[currency]['symbol']
-    return f"{symbol}{amount:.2f}"
+    sign = '-' if amount < 0 else ''
+    whole, cents = divmod(abs(amount), 100)
+    return f"{symbol}{sign}{whole}.{cents:02d}"
 
-def check_budget_reset():
+def check_budget_reset(now):
     """Check if budget needs to be reset based on the interval"""
     if not st.session_state.budget_start_date:
         return
 
-    now = datetime.now()
     start_date = st.session_state.budget_start_date
 
     reset_needed = False
@@ -168,7 +325,8 @@ def check_budget_reset():
 
     if reset_needed:
         st.session_state.budget_start_date = now
-        st.session_state.expenses = []
+        st.session_state.period_start_idx = len(st.session_state.expense_history)
+        st.session_state.total_expenses = 0
 
 def show_budget_notification(remaining_budget):
     """Show budget notification if enabled"""
@@ -181,13 +339,13 @@ def show_budget_notification(remaining_budget):
                 ⚠️ Warning: Your budget is depleted! Consider adjusting your spending or setting a new budget.
             </div>
         """, unsafe_allow_html=True)
-    elif remaining_budget <= (st.session_state.budget_amount * Decimal('0.01')) and st.session_state.critical_warning_enabled:
+    elif remaining_budget <= st.session_state.critical_threshold and st.session_state.critical_warning_enabled:
         st.markdown("""
             <div class="notification critical-warning">
                 ⚠️ Critical Warning: Less than 1% of your budget remaining!
             </div>
         """, unsafe_allow_html=True)
-    elif remaining_budget < (st.session_state.budget_amount * Decimal('0.2')):
+    elif remaining_budget < st.session_state.warn_threshold:
         st.markdown("""
             <div class="notification" style="background-color: #ffc107; color: black;">
                 ⚠️ Warning: Less than 20% of your budget remaining!
@@ -207,13 +365,13 @@ def main_menu():
     st.markdown("<div class='currency-selector'>", unsafe_allow_html=True)
     currency = st.selectbox(
         "Select your currency:",
-        options=list(CURRENCIES.keys()),
+        options=CURRENCY_KEYS,
         format_func=lambda x: f"{x} ({CURRENCIES[x]['symbol']}) - {CURRENCIES[x]['name']}",
-        index=list(CURRENCIES.keys()).index(st.session_state.currency)
+        index=CURRENCY_INDEX[st.session_state.currency]
     )
     if currency != st.session_state.currency:
         st.session_state.currency = currency
-        save_settings()
+        mark_settings_dirty()
     st.markdown("</div>", unsafe_allow_html=True)
 
     # Add history button to main menu
@@ -240,7 +398,7 @@ def settings():
     )
     if theme != st.session_state.theme:
         st.session_state.theme = theme
-        save_settings()
+        mark_settings_dirty()
         st.rerun()
 
     # Notification settings
@@ -253,7 +411,7 @@ def settings():
     )
     if notifications_enabled != st.session_state.notifications_enabled:
         st.session_state.notifications_enabled = notifications_enabled
-        save_settings()
+        mark_settings_dirty()
 
     if st.session_state.notifications_enabled:
         critical_warning_enabled = st.toggle(
@@ -263,9 +421,30 @@ def settings():
         )
         if critical_warning_enabled != st.session_state.critical_warning_enabled:
             st.session_state.critical_warning_enabled = critical_warning_enabled
-            save_settings()
-
-def budget_tracker():
+            mark_settings_dirty()
+
+@st.fragment
+def _add_expense_fragment():
+    """Add-expense form; its widgets rerun only this fragment until an expense is added"""
+    st.subheader("Add New Expense")
+    category = st.selectbox("Category", EXPENSE_CATEGORIES)
+    amount = st.text_input(f"Amount ({CURRENCIES[st.session_state.currency]['symbol']})", placeholder="0.00")
+    description = st.text_input("Description (optional)")
+
+    if st.button("Add Expense"):
+        expense_amount = parse_cents(amount)
+        if expense_amount is None:
+            st.error("Please enter a valid amount.")
+        elif expense_amount <= 0:
+            st.error("Please enter a positive amount.")
+        else:
+            # A fragment rerun skips budget_tracker's reset check; the period may have ended
+            check_budget_reset(datetime.now())
+            add_expense(expense_amount, description, category)
+            # Budget status and history live outside the fragment
+            st.rerun(scope="app")
+
+def budget_tracker(now):
     st.title("📊 Budget Tracker")
 
     # Use columns for better mobile layout
@@ -278,7 +457,7 @@ def budget_tracker():
 
     # Check for budget reset
     if st.session_state.budget_type:
-        check_budget_reset()
+        check_budget_reset(now)
 
     if not st.session_state.budget_type:
         budget_type = st.selectbox(
@@ -293,24 +472,27 @@ def budget_tracker():
         )
 
         if st.button("Set Budget"):
-            try:
-                amount = Decimal(re.sub(r'[^\d.]', '', budget_amount))
-                if amount <= 0:
-                    st.error("Please enter a positive budget amount.")
-                else:
-                    st.session_state.budget_type = budget_type
-                    st.session_state.budget_amount = amount
-                    st.session_state.budget_start_date = datetime.now()
-                    st.rerun()
-            except (InvalidOperation, ValueError):
+            amount = parse_cents(budget_amount)
+            if amount is None:
                 st.error("Please enter a valid budget amount.")
+            elif amount <= 0:
+                st.error("Please enter a positive budget amount.")
+            else:
+                st.session_state.budget_type = budget_type
+                st.session_state.budget_amount = amount
+                # Notification thresholds: 20% and 1% of the budget
+                st.session_state.warn_threshold = amount // 5
+                st.session_state.critical_threshold = amount // 100
+                st.session_state.budget_start_date = now
+                st.session_state.period_start_idx = len(st.session_state.expense_history)
+                st.rerun()
     else:
         # Display budget status
-        total_expenses = sum(expense['amount'] for expense in st.session_state.expenses)
+        total_expenses = st.session_state.total_expenses
         remaining_budget = st.session_state.budget_amount - total_expenses
 
         status_class = "budget-ok"
-        if remaining_budget < (st.session_state.budget_amount * Decimal('0.2')):
+        if remaining_budget < st.session_state.warn_threshold:
             status_class = "budget-warning"
         if remaining_budget < 0:
             status_class = "budget-exceeded"
@@ -332,39 +514,32 @@ def budget_tracker():
         """, unsafe_allow_html=True)
 
         # Add new expense
-        st.subheader("Add New Expense")
-        category = st.selectbox("Category", EXPENSE_CATEGORIES)
-        amount = st.text_input(f"Amount ({CURRENCIES[st.session_state.currency]['symbol']})", placeholder="0.00")
-        description = st.text_input("Description (optional)")
-
-        if st.button("Add Expense"):
-            try:
-                expense_amount = Decimal(re.sub(r'[^\d.]', '', amount))
-                if expense_amount <= 0:
-                    st.error("Please enter a positive amount.")
-                else:
-                    add_expense(expense_amount, description, category)
-                    st.rerun()
-            except (InvalidOperation, ValueError):
-                st.error("Please enter a valid amount.")
+        _add_expense_fragment()
 
         # Display expense history (moved to separate function)
-        if st.session_state.expenses:
+        history = st.session_state.expense_history
+        period_rows = range(st.session_state.period_start_idx, len(history))
+        if period_rows:
             st.subheader("Expense History")
-            for expense in reversed(st.session_state.expenses):
-                st.markdown(f"""
+            # Emit the whole list as one element rather than one per expense
+            parts = []
+            for i in reversed(period_rows):
+                parts.append(f"""
                     <div style="padding: 0.5rem; border-bottom: 1px solid #eee;">
-                        <p><strong>{expense['date'].strftime('%Y-%m-%d %H:%M')}</strong></p>
-                        <p>{expense['category']}: {expense['description']}</p>
-                        <p style="color: #dc3545;">Amount: {format_amount(expense['amount'], st.session_state.currency)}</p>
+                        <p><strong>{history.dates[i].strftime('%Y-%m-%d %H:%M')}</strong></p>
+                        <p>{history.categories[i]}: {history.descriptions[i]}</p>
+                        <p style="color: #dc3545;">Amount: {format_amount(history.amounts[i], st.session_state.currency)}</p>
                     </div>
-                """, unsafe_allow_html=True)
+                """)
+            st.markdown(''.join(parts), unsafe_allow_html=True)
 
         if st.button("Reset Budget"):
             st.session_state.budget_type = None
             st.session_state.budget_amount = None
+            st.session_state.warn_threshold = None
+            st.session_state.critical_threshold = None
             st.session_state.budget_start_date = None
-            st.session_state.expenses = []
+            st.session_state.total_expenses = 0
             st.rerun()
 
 def get_next_reset_date():
@@ -412,12 +587,13 @@ def expense_calculator():
         if price is not None and qty is not None:
             if price < 0 or qty < 0:
                 st.error("Please enter positive values only.")
+            elif (total := to_cents(price * qty)) is None:
+                st.error("Please enter smaller values.")
             else:
-                total = price * qty
                 st.success(f"Total food expense: {format_amount(total, st.session_state.currency)}")
 
                 if st.button("Add to Budget"):
-                    add_expense(total, f"Food expense - {qty} items at {format_amount(price, st.session_state.currency)} each", expense_type)
+                    add_expense(total, f"Food expense - {qty} items at {format_amount(to_cents(price), st.session_state.currency)} each", expense_type)
                     st.rerun()
     else:
         col1, col2 = st.columns(2)
@@ -435,25 +611,33 @@ def expense_calculator():
         if price is not None and gal is not None:
             if price < 0 or gal < 0:
                 st.error("Please enter positive values only.")
+            elif (total := to_cents(price * gal)) is None:
+                st.error("Please enter smaller values.")
             else:
-                total = price * gal
                 st.success(f"Total gas expense: {format_amount(total, st.session_state.currency)}")
 
                 if st.button("Add to Budget"):
-                    add_expense(total, f"Gas expense - {gal} gallons at {format_amount(price, st.session_state.currency)}/gallon", expense_type)
+                    add_expense(total, f"Gas expense - {gal} gallons at {format_amount(to_cents(price), st.session_state.currency)}/gallon", expense_type)
                     st.rerun()
 
 def validate_decimal_input(value):
     if not value:
         return None
     try:
-        cleaned_value = re.sub(r'[^\d.]', '', value)
+        cleaned_value = _CLEAN_NUM.sub('', value)
         return Decimal(cleaned_value)
     except (InvalidOperation, ValueError):
         return None
 
+def parse_cents(value):
+    """Parse a money input into integer cents"""
+    amount = validate_decimal_input(value)
+    if amount is None:
+        return None
+    return to_cents(amount)
+
 def add_expense(amount, description, category):
-    """Add an expense to both current period and history"""
+    """Add an expense to history and the current period total"""
     expense = {
         'date': datetime.now(),
         'amount': amount,
@@ -465,12 +649,12 @@ def add_expense(amount, description, category):
     }
 
     if st.session_state.budget_type:
-        st.session_state.expenses.append(expense)
+        st.session_state.total_expenses += amount
         st.session_state.expense_history.append(expense)
-        save_settings()
+        append_expense(expense)
 
 
-def expense_history():
+def expense_history(now):
     st.title("📈 Cost History Analysis")
 
     # Filtering options
@@ -480,32 +664,35 @@ def expense_history():
     with col1:
         selected_category = st.selectbox(
             "Category",
-            ["All"] + EXPENSE_CATEGORIES
+            HISTORY_CATEGORY_OPTIONS
         )
 
     with col2:
         date_range = st.selectbox(
             "Time Period",
-            ["Last 7 days", "Last 30 days", "Last 3 months", "All time"]
+            HISTORY_PERIOD_OPTIONS
         )
 
-    # Filter expenses based on selection
-    filtered_expenses = st.session_state.expense_history.copy()
-    if selected_category != "All":
-        filtered_expenses = [e for e in filtered_expenses if e['category'] == selected_category]
-
-    now = datetime.now()
-    if date_range == "Last 7 days":
-        filtered_expenses = [e for e in filtered_expenses if (now - e['date']).days <= 7]
-    elif date_range == "Last 30 days":
-        filtered_expenses = [e for e in filtered_expenses if (now - e['date']).days <= 30]
-    elif date_range == "Last 3 months":
-        filtered_expenses = [e for e in filtered_expenses if (now - e['date']).days <= 90]
+    # Filter expenses based on selection in a single pass
+    days = HISTORY_PERIOD_DAYS.get(date_range)
+    # An expense is within N days while (now - date).days <= N, i.e. date > now - (N + 1) days
+    history = st.session_state.expense_history
+    dates = history.dates
+    if days is None:
+        start = 0
+    else:
+        # History is appended in date order, so the period is a suffix of the columns
+        cutoff = now - timedelta(days=days + 1)
+        start = bisect.bisect_right(dates, cutoff)
+    category = None if selected_category == "All" else selected_category
+    filtered, total_spent = history.select(start, category)
 
     # Display summary statistics
-    if filtered_expenses:
-        total_spent = sum(e['amount'] for e in filtered_expenses)
-        avg_per_day = total_spent / max(1, (now - min(e['date'] for e in filtered_expenses)).days)
+    if filtered:
+        amounts = history.amounts
+        # Rows are in date order, so the first match is the earliest
+        first_date = dates[filtered[0]]
+        avg_per_day = round(total_spent / max(1, (now - first_date).days))
 
         st.markdown(f"""
             <div class="budget-status budget-ok">
@@ -513,23 +700,25 @@ def expense_history():
                 <div class="remaining-budget">
                     {format_amount(total_spent, st.session_state.currency)}
                 </div>
-                <p>Total Expenses: {len(filtered_expenses)}</p>
+                <p>Total Expenses: {len(filtered)}</p>
                 <p>Average per day: {format_amount(avg_per_day, st.session_state.currency)}</p>
             </div>
         """, unsafe_allow_html=True)
 
         # Display expense history with enhanced details
         st.subheader("Detailed History")
-        for expense in sorted(filtered_expenses, key=lambda x: x['date'], reverse=True):
-            st.markdown(f"""
+        parts = []
+        for i in reversed(filtered):
+            parts.append(f"""
                 <div style="padding: 1rem; border: 1px solid #eee; border-radius: 0.5rem; margin: 0.5rem 0;">
-                    <p><strong>{expense['date'].strftime('%Y-%m-%d %H:%M')}</strong></p>
-                    <p>Category: {expense['category']}</p>
-                    <p>{expense['description']}</p>
-                    <p>Amount: {format_amount(expense['amount'], expense['currency'])}</p>
-                    <p style="color: #666;">Budget Period: {expense['budget_period']}</p>
+                    <p><strong>{dates[i].strftime('%Y-%m-%d %H:%M')}</strong></p>
+                    <p>Category: {history.categories[i]}</p>
+                    <p>{history.descriptions[i]}</p>
+                    <p>Amount: {format_amount(amounts[i], history.currencies[i])}</p>
+                    <p style="color: #666;">Budget Period: {history.budget_periods[i]}</p>
                 </div>
-            """, unsafe_allow_html=True)
+            """)
+        st.markdown(''.join(parts), unsafe_allow_html=True)
     else:
         st.info("No expenses found for the selected filters.")
 
@@ -547,14 +736,15 @@ with col1:
             st.rerun()
 
 # Main content
+now = datetime.now()
 if st.session_state.page == 'main_menu':
     main_menu()
 elif st.session_state.page == 'budget':
-    budget_tracker()
+    budget_tracker(now)
 elif st.session_state.page == 'settings':
     settings()
 elif st.session_state.page == 'history':
-    expense_history()
+    expense_history(now)
 else:
     expense_calculator()
 
@@ -566,3 +756,8 @@ st.markdown(
     "</div>",
     unsafe_allow_html=True
 )
+
+# Persist any settings changes made during this run in a single write
+if st.session_state.get('_settings_dirty'):
+    save_settings()
+    st.session_state._settings_dirty = False